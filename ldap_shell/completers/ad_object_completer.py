@@ -3,18 +3,35 @@ from prompt_toolkit.document import Document
 from prompt_toolkit.formatted_text import HTML
 from .base import BaseArgumentCompleter
 from abc import abstractmethod
-from ldap3 import SUBTREE
-from ldap_shell.completers.base import ADObjectCacheManager
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Optional
+import logging
+from ldap_shell.completers.base import ADObjectCacheManager, ADObjectIndex
+from ldap_shell.utils.ldap_utils import LdapConnectionPool
+
+# Errors go to the log, not stdout: printing while the prompt is drawn garbles it
+log = logging.getLogger('ldap-shell.completers')
+
+SEARCH_RESULT_ENTRY = 'searchResEntry'
 
 class ADObjectCompleter(BaseArgumentCompleter):
     """Completer for AD objects (users, computers, groups, OUs)"""
     highlight_color = None  # Base color, overridden in child classes
     attributes = ['sAMAccountName', 'name']  # Base set of attributes
+    substring_match = False  # Match anywhere in the name, not only the prefix
+    min_prefix_length = 1  # Characters to type before completions are offered
+    max_completions = 200  # Completions yielded per keystroke at most
     
     def __init__(self, ldap_connection, domain_dumper):
         self.ldap = ldap_connection
         self.domain_dumper = domain_dumper
-        self.cache_manager = ADObjectCacheManager()
+        self.cache_manager = ADObjectCacheManager
+        # Background wrapper shared by every completion this completer yields
+        self._bg_open = f"<style bg='{self.highlight_color}'>" if self.highlight_color else ''
+        self._bg_close = '</style>' if self.highlight_color else ''
+        # Start filling the cache as soon as the completer exists, not on first match
+        self.index = self._get_index()
 
     def get_completions(self, document: Document, complete_event, current_word=None):
         if not isinstance(document, Document):
@@ -23,29 +40,63 @@ class ADObjectCompleter(BaseArgumentCompleter):
         text = document.text_before_cursor
         in_quotes = (text.count('"') % 2) == 1 or (text.count("'") % 2) == 1
         
-        # Get cache from manager
-        cached_objects = self.cache_manager.get_cache(self.__class__.__name__)
-        if cached_objects is None:
-            cached_objects = self._get_ad_objects()
-            self.cache_manager.set_cache(self.__class__.__name__, cached_objects)
-        
-        if text.endswith(' '):
-            word_before_cursor = ''
+        if in_quotes:
+            # Inside quotes the word may contain spaces: take everything after the open quote
+            quote = '"' if (text.count('"') % 2) == 1 else "'"
+            word_before_cursor = text[text.rfind(quote) + 1:]
         else:
-            word_before_cursor = text.split()[-1] if text.split() else ''
-
-        for obj in cached_objects:
-            if ' ' in obj and not in_quotes:
-                obj = f'"{obj}"'
-            if word_before_cursor.lower() in obj.lower():
-                display = self._highlight_match(obj, word_before_cursor)
-                if self.highlight_color:
-                    display = f"<style bg='{self.highlight_color}'>{display}</style>"
-                yield Completion(
-                    obj,
-                    start_position=-len(word_before_cursor),
-                    display=HTML(display)
-                )
+            # Only the last token is needed, so split off at most one
+            tokens = text.rsplit(maxsplit=1)
+            word_before_cursor = '' if text.endswith(' ') or not tokens else tokens[-1]
+        # An empty word matches every object; type at least one character (or '*' for all)
+        if len(word_before_cursor) < self.min_prefix_length:
+            return
+
+        # Partial results are shown while the background search is still running
+        cached_objects = self.index.snapshot()
+        if not cached_objects[1]:
+            return
+
+        # A leading '*' requests a substring match instead of a prefix match
+        substring = self.substring_match or word_before_cursor.startswith('*')
+        pattern = word_before_cursor.lstrip('*')
+        word_lower = pattern.lower()
+        # Don't build more completions than the menu can usefully show
+        matches = islice(self._iter_matches(cached_objects, word_lower, substring), self.max_completions)
+        for obj, quoted in matches:
+            if not in_quotes:
+                obj = quoted
+            display = ''.join((self._bg_open, self._highlight_match(obj, pattern), self._bg_close))
+            yield Completion(
+                obj,
+                start_position=-len(word_before_cursor),
+                display=HTML(display)
+            )
+
+    def _iter_matches(self, cached_objects, word_lower: str, substring: bool):
+        """Yields (name, quoted name) pairs matching the lowercased word"""
+        sorted_lower, entries = cached_objects
+        if substring:
+            if not word_lower:
+                yield from entries
+                return
+            # Scan the packed buffer in one bytes.find per hit instead of testing every name
+            blob, offsets = self.index.packed(sorted_lower)
+            needle = word_lower.encode()
+            pos = blob.find(needle)
+            while pos >= 0:
+                i = bisect_right(offsets, pos) - 1
+                yield entries[i]
+                if i + 1 >= len(offsets):
+                    return
+                pos = blob.find(needle, offsets[i + 1])
+            return
+
+        # Prefix match: binary search the sorted keys, then walk forward
+        i = bisect_left(sorted_lower, word_lower)
+        while i < len(sorted_lower) and sorted_lower[i].startswith(word_lower):
+            yield entries[i]
+            i += 1
 
     def _highlight_match(self, text: str, substr: str) -> str:
         """Highlights the matching part of the text"""
@@ -60,35 +111,78 @@ class ADObjectCompleter(BaseArgumentCompleter):
             return f"{before}<b><style fg='black'>{match}</style></b>{after}"
         return text
 
-    def _get_ad_objects(self):
-        objects = set()
-        ldap_filter = self.get_ldap_filter()
-        
+    def _get_index(self) -> ADObjectIndex:
+        """Get cached index from manager, scheduling a background fill if missing or stale"""
         try:
-            # Use built-in method for pagination
-            search_generator = self.ldap.extend.standard.paged_search(
-                search_base=self.domain_dumper.root,
-                search_filter=ldap_filter,
-                search_scope=SUBTREE,
-                attributes=self.attributes,
-                paged_size=500,
-                generator=True
-            )
-            
-            for entry in search_generator:
-                if entry['type'] != 'searchResEntry':
-                    continue
-                    
-                # Priority attributes for each object type
-                if self.primary_attribute in entry['attributes']:
-                    objects.add(str(entry['attributes'][self.primary_attribute]))
-                elif self.fallback_attribute in entry['attributes']:
-                    objects.add(str(entry['attributes'][self.fallback_attribute]))
-            
+            return self.cache_manager.get_or_fetch(self._cache_key(), self._start_fill, self._refresh_index)
         except Exception as e:
-            print(f"Error fetching AD objects: {str(e)}")
-            
-        return objects
+            log.debug(f"Error fetching AD objects: {str(e)}")
+            return ADObjectIndex()
+
+    def _start_fill(self) -> ADObjectIndex:
+        index = ADObjectIndex()
+        if LdapConnectionPool.for_client(self.ldap).can_clone():
+            self.cache_manager.submit(self._fill_index, index)
+        else:
+            # No private connection to search on: fill in the foreground, since a background
+            # search on the shell client could clobber results a module is about to read
+            for objects in self._get_ad_objects(background=False):
+                index.add(objects)
+        return index
+
+    def _cache_key(self) -> tuple:
+        """Completers running the same search share one cache entry"""
+        return (self.get_ldap_filter(), tuple(self.attributes), self.primary_attribute, self.fallback_attribute)
+
+    def _fill_index(self, index: ADObjectIndex):
+        """Background job: stream AD objects into the index, publishing each page as it arrives"""
+        if not self._run_fill(index):
+            # Drop the partial result so the next completion retries the search
+            self.cache_manager.discard(self._cache_key(), index)
+
+    def _refresh_index(self) -> Optional[ADObjectIndex]:
+        """Background job: build a replacement for a stale index, or None to keep serving the old one"""
+        # Without a private connection the refill would have to run on the shell client
+        # in the foreground, stalling the prompt; the stale index is better than that
+        if not LdapConnectionPool.for_client(self.ldap).can_clone():
+            return None
+        index = ADObjectIndex()
+        return index if self._run_fill(index) else None
+
+    def _run_fill(self, index: ADObjectIndex) -> bool:
+        """Stream AD objects into the index on a pooled connection; returns whether the search completed"""
+        try:
+            for objects in self._get_ad_objects(background=True):
+                index.add(objects)
+                # Don't request further pages once the shell is exiting
+                if self.cache_manager.is_stopped():
+                    return False
+            return True
+        except Exception as e:
+            log.debug(f"Error fetching AD objects: {str(e)}")
+            return False
+
+    def _get_ad_objects(self, background: bool):
+        """Yield the names found in each page of the paged search"""
+        ldap_filter = self.get_ldap_filter()
+
+        # Paged search through the connection pool so the fill doesn't block shell commands
+        pool = LdapConnectionPool.for_client(self.ldap)
+        primary, fallback = self.primary_attribute, self.fallback_attribute
+        for page in pool.paged_search(self.domain_dumper.root, ldap_filter, attributes=self.attributes,
+                                      paged_size=500, background=background):
+            objects = []
+            for entry in page:
+                if entry['type'] != SEARCH_RESULT_ENTRY:
+                    continue
+
+                # Priority attributes for each object type; a single lookup each on
+                # ldap3's CaseInsensitiveDict, and empty values fall through to the fallback
+                attributes = entry['attributes']
+                value = attributes.get(primary) or attributes.get(fallback)
+                if value:
+                    objects.append(str(value))
+            yield objects
 
     @abstractmethod
     def get_ldap_filter(self):
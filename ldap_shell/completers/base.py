@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
 from prompt_toolkit.completion import Completion
 from prompt_toolkit.document import Document
-from typing import Dict, Optional
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, Optional, Set
 import threading
+import time
 from ldap_shell.utils import history
 
 class BaseArgumentCompleter(ABC):
@@ -13,21 +17,96 @@ class BaseArgumentCompleter(ABC):
         """Return list of completions for current word"""
         pass
 
+class ADObjectIndex:
+    """Sorted prefix index of AD object names, filled incrementally by a background search"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = set()
+        # Append-only queue of names from the search; deduplicated when a snapshot folds it in
+        self._pending = deque()
+        self._sorted_lower = []
+        self._entries = []
+        # Lowercased names packed into one buffer for substring scans, with each name's start
+        # offset; built on the first substring query against a snapshot, not on every page
+        self._packed_for = None
+        self._blob = b''
+        self._offsets = []
+
+    def add(self, names: Iterable[str]):
+        """Add a page of names; they become visible on the next snapshot"""
+        with self._lock:
+            self._pending.extend(names)
+
+    def snapshot(self) -> tuple[list, list]:
+        """Return (sorted lowercased names, [(name, quoted name)]) for everything added so far"""
+        with self._lock:
+            new_names = []
+            while self._pending:
+                name = self._pending.popleft()
+                if name not in self._names:
+                    self._names.add(name)
+                    new_names.append(name)
+
+            if new_names:
+                # Precompute lowercased and quoted forms once instead of on every keystroke
+                indexed = sorted((name.lower(), (name, f'"{name}"' if ' ' in name else name)) for name in new_names)
+                self._merge(indexed)
+            return self._sorted_lower, self._entries
+
+    def _merge(self, indexed: list):
+        """Merge sorted (lower, entry) pairs into new sorted lists
+
+        Only the new names are sorted; the existing lists are copied across in slices
+        between their insertion points. New lists are built rather than inserting in
+        place, so snapshots already handed out stay valid.
+        """
+        sorted_lower, entries = self._sorted_lower, self._entries
+        merged_lower, merged_entries = [], []
+        start = 0
+        for obj_lower, entry in indexed:
+            i = bisect_right(sorted_lower, obj_lower, start)
+            merged_lower += sorted_lower[start:i]
+            merged_entries += entries[start:i]
+            merged_lower.append(obj_lower)
+            merged_entries.append(entry)
+            start = i
+        merged_lower += sorted_lower[start:]
+        merged_entries += entries[start:]
+        self._sorted_lower, self._entries = merged_lower, merged_entries
+
+    def packed(self, sorted_lower: list) -> tuple[bytes, list]:
+        """Return (blob, offsets) for the lowercased names of a snapshot, building them on first use"""
+        with self._lock:
+            if self._packed_for is not sorted_lower:
+                encoded = [obj_lower.encode() for obj_lower in sorted_lower]
+                self._blob = b'\x01'.join(encoded)
+                self._offsets = []
+                offset = 0
+                for chunk in encoded:
+                    self._offsets.append(offset)
+                    offset += len(chunk) + 1
+                self._packed_for = sorted_lower
+            return self._blob, self._offsets
+
 class ADObjectCacheManager:
-    """Singleton cache manager for AD objects"""
-    _instance = None
+    """Process-wide cache manager for AD objects, shared by all completer instances
+
+    Entries are keyed by what was searched (filter and attributes), not by completer class,
+    so completers issuing the same search reuse one result.
+    """
     _lock = threading.Lock()
-    _caches: Dict[str, Dict] = {}
+    _caches: Dict[Hashable, Dict] = {}
+    _in_flight: Dict[Hashable, Future] = {}
+    _refreshing: Set[Hashable] = set()
     _last_history_position = 0
+    # Single worker shared by all completers so cache fills never run in parallel
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ad-cache')
+    _stopped = threading.Event()
+    cache_ttl = 300  # Seconds before a cached object list is considered stale
     
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-        return cls._instance
-    
-    def _should_refresh_cache(self) -> bool:
+    @classmethod
+    def _should_refresh_cache(cls) -> bool:
         """Checks if cache needs to be refreshed based on new commands in history"""
         try:
             # Get all commands from history
@@ -35,10 +114,10 @@ class ADObjectCacheManager:
             current_position = len(history_commands)
             
             # If position changed, check new commands
-            if current_position > self._last_history_position:
+            if current_position > cls._last_history_position:
                 # Check only new commands
-                new_commands = history_commands[self._last_history_position:]
-                self._last_history_position = current_position
+                new_commands = history_commands[cls._last_history_position:]
+                cls._last_history_position = current_position
                 
                 # Check if there are add_ or del_ among new commands
                 return any(
@@ -50,27 +129,133 @@ class ADObjectCacheManager:
         except Exception:
             return False
     
-    def get_cache(self, completer_type: str) -> Optional[set]:
-        """Get cache for specific completer type"""
-        cache_data = self._caches.get(completer_type)
-        if cache_data is None:
+    @classmethod
+    def _get_entry(cls, key: Hashable):
+        """Get the cache entry for a search key, or None if missing or invalidated"""
+        # Objects were added or deleted: every cached search may be outdated
+        if cls._should_refresh_cache():
+            cls._caches.clear()
             return None
-            
-        # Check if cache needs to be refreshed
-        if self._should_refresh_cache():
+        return cls._caches.get(key)
+
+    @classmethod
+    def _is_stale(cls, cache_data: Dict) -> bool:
+        return time.monotonic() - cache_data['timestamp'] > cls.cache_ttl
+
+    @classmethod
+    def get_cache(cls, key: Hashable):
+        """Get cache for a search key, or None if missing or stale"""
+        cache_data = cls._get_entry(key)
+        if cache_data is None or cls._is_stale(cache_data):
             return None
-            
         return cache_data['objects']
     
-    def set_cache(self, completer_type: str, objects: set):
-        """Set cache for specific completer type"""
-        self._caches[completer_type] = {
+    @classmethod
+    def set_cache(cls, key: Hashable, objects):
+        """Set cache for a search key"""
+        cls._caches[key] = {
+            'timestamp': time.monotonic(),
             'objects': objects
         }
+
+    @classmethod
+    def get_or_fetch(cls, key: Hashable, fetch: Callable, refresh: Optional[Callable] = None):
+        """Get cache for a search key, running fetch() to fill it if needed
+
+        Only one fetch per key is in flight at a time: concurrent callers
+        (prompt_toolkit may complete from several threads) wait for and reuse its result.
+        With refresh, a stale entry keeps being returned while refresh() builds its
+        replacement on the background worker; refresh returns None to keep the stale one.
+        """
+        with cls._lock:
+            cache_data = cls._get_entry(key)
+            if cache_data is not None:
+                if not cls._is_stale(cache_data):
+                    return cache_data['objects']
+                if refresh is not None:
+                    if key not in cls._refreshing and not cls.is_stopped():
+                        cls._refreshing.add(key)
+                        cls.submit(cls._refresh, key, cache_data, refresh)
+                    return cache_data['objects']
+            future = cls._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = cls._in_flight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            objects = fetch()
+            cls.set_cache(key, objects)
+            future.set_result(objects)
+            return objects
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with cls._lock:
+                cls._in_flight.pop(key, None)
+
+    @classmethod
+    def _refresh(cls, key: Hashable, stale: Dict, refresh: Callable):
+        """Background job: swap a refreshed result in for a stale entry"""
+        try:
+            objects = refresh()
+        except Exception:
+            objects = None
+        with cls._lock:
+            cls._refreshing.discard(key)
+            # Invalidated (add_/del_) or replaced while refreshing: leave the entry alone
+            if cls._caches.get(key) is not stale:
+                return
+            if objects is None:
+                # Keep serving the stale entry and try again after another cache_ttl
+                stale['timestamp'] = time.monotonic()
+            else:
+                cls.set_cache(key, objects)
+
+    @classmethod
+    def submit(cls, fn, *args):
+        """Run a cache fill in the background worker"""
+        return cls._executor.submit(fn, *args)
     
-    def clear_cache(self, completer_type: Optional[str] = None):
-        """Clear cache for specific completer type or all caches"""
-        if completer_type:
-            self._caches.pop(completer_type, None)
+    @classmethod
+    def is_stopped(cls) -> bool:
+        """Whether background fills should stop (the shell is exiting)"""
+        return cls._stopped.is_set()
+
+    @classmethod
+    def shutdown(cls):
+        """Stop background fills so they don't hold up interpreter exit
+
+        The worker is not a daemon thread, so queued searches would otherwise run to
+        completion at exit. Queued fills are cancelled; a running one stops after its
+        current page.
+        """
+        cls._stopped.set()
+        cls._executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def discard(cls, key: Hashable, objects):
+        """Drop the entry for a search key if it still holds objects (e.g. a fill that failed)"""
+        with cls._lock:
+            future = cls._in_flight.get(key)
+        if future is not None:
+            # A background fill can fail before get_or_fetch has stored its result
+            try:
+                future.result()
+            except Exception:
+                pass
+        with cls._lock:
+            cache_data = cls._caches.get(key)
+            if cache_data is not None and cache_data['objects'] is objects:
+                del cls._caches[key]
+
+    @classmethod
+    def clear_cache(cls, key: Optional[Hashable] = None):
+        """Clear cache for a search key or all caches"""
+        if key is not None:
+            cls._caches.pop(key, None)
         else:
-            self._caches.clear()
\ No newline at end of file
+            cls._caches.clear()
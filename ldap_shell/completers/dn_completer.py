@@ -2,15 +2,22 @@ from prompt_toolkit.completion import Completion
 from prompt_toolkit.document import Document
 from .base import BaseArgumentCompleter
 from prompt_toolkit.formatted_text import HTML
-from ldap3 import SUBTREE
 from ldap_shell.completers.base import ADObjectCacheManager
+from ldap_shell.utils.ldap_utils import LdapConnectionPool
+import logging
+from typing import Optional
+
+log = logging.getLogger('ldap-shell.completers')
 
 class DNCompleter(BaseArgumentCompleter):
     """Completer for DN"""
+    attributes = ['distinguishedName', 'objectClass', 'sAMAccountName', 'ou', 'displayName', 'cn']
+    cache_key = ('(objectClass=*)', tuple(attributes))
+
     def __init__(self, ldap_connection, domain_dumper):
         self.ldap = ldap_connection
         self.domain_dumper = domain_dumper
-        self.cache_manager = ADObjectCacheManager()
+        self.cache_manager = ADObjectCacheManager
 
     def get_completions(self, document: Document, complete_event, current_word=None):
         if not isinstance(document, Document):
@@ -19,15 +26,15 @@ class DNCompleter(BaseArgumentCompleter):
         text = document.text_before_cursor.replace('"', '')
         
         # Get cache from manager
-        cached_objects = self.cache_manager.get_cache(self.__class__.__name__)
-        if cached_objects is None:
-            cached_objects = self._get_ad_objects()
-            self.cache_manager.set_cache(self.__class__.__name__, cached_objects)
+        try:
+            cached_objects = self.cache_manager.get_or_fetch(self.cache_key, self._get_ad_objects, self._refresh_objects)
+        except Exception as e:
+            log.debug(f"Error fetching AD objects: {str(e)}")
+            return
         
-        if text.endswith(' '):
-            word_before_cursor = ''
-        else:
-            word_before_cursor = text.split()[-1] if text.split() else ''
+        # Only the last token is needed, so split off at most one
+        tokens = text.rsplit(maxsplit=1)
+        word_before_cursor = '' if text.endswith(' ') or not tokens else tokens[-1]
 
         for obj in cached_objects:
             # Check both identifier and DN
@@ -56,7 +63,13 @@ class DNCompleter(BaseArgumentCompleter):
             return f"{before}<b><style fg='black'>{match}</style></b>{after}"
         return text
 
-    def _get_ad_objects(self):
+    def _refresh_objects(self):
+        """Background job: search again for a stale cache, or None to keep serving the old list"""
+        if not LdapConnectionPool.for_client(self.ldap).can_clone():
+            return None
+        return self._get_ad_objects(background=True)
+
+    def _get_ad_objects(self, background: Optional[bool] = None):
         objects = []
         COLOR_MAPPING = {
             'user': 'ansibrightgreen',
@@ -67,17 +80,15 @@ class DNCompleter(BaseArgumentCompleter):
             'gpo': 'ansibrightblue'
         }
 
-        # Use built-in method for pagination
-        search_generator = self.ldap.extend.standard.paged_search(
-            search_base=self.domain_dumper.root,
-            search_filter='(objectClass=*)',
-            search_scope=SUBTREE,
-            attributes=['distinguishedName', 'objectClass', 'sAMAccountName', 'ou', 'displayName', 'cn'],
-            paged_size=500,
-            generator=True
-        )
+        # Paged search through the connection pool: on a private connection when the bind
+        # can be cloned, otherwise on the shell client one page at a time under its lock
+        pool = LdapConnectionPool.for_client(self.ldap)
+        if background is None:
+            background = pool.can_clone()
+        pages = pool.paged_search(self.domain_dumper.root, '(objectClass=*)', attributes=self.attributes,
+                                  paged_size=500, background=background)
 
-        for entry in search_generator:
+        for entry in (entry for page in pages for entry in page):
             if entry['type'] != 'searchResEntry':
                 continue
             
@@ -34,9 +34,10 @@ class RBCDCompleter(BaseArgumentCompleter):
 
         if sd_data:
             sd = SR_SECURITY_DESCRIPTOR(data=sd_data[0])
-            for ace in sd['Dacl'].aces:
-                sid = ace['Ace']['Sid'].formatCanonical()
-                users_list.append(LdapUtils.sid_to_user(self.client, self.domain_dumper, sid))
+            sids = [ace['Ace']['Sid'].formatCanonical() for ace in sd['Dacl'].aces]
+            # Resolve all ACE SIDs in one search instead of one per ACE
+            users = LdapUtils.sid_to_users(self.client, self.domain_dumper, sids)
+            users_list = [users[sid] for sid in sids if sid in users]
         else:
             return
 
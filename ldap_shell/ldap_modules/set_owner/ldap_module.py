@@ -52,13 +52,13 @@ class LdapShellModule(BaseLdapModule):
             self.log.info('Grantee account not provided, using current user')
             self.args.grantee = self.client.user.split('\\')[1]
 
-        # Get grantee information
-        grantee_dn = LdapUtils.get_dn(self.client, self.domain_dumper, self.args.grantee)
-        if not grantee_dn:
+        # Get grantee DN and SID in a single search
+        grantee = LdapUtils.get_object(self.client, self.domain_dumper, self.args.grantee, ['objectSid'])
+        if not grantee:
             self.log.error(f'Grantee account not found: {self.args.grantee}')
             return
 
-        grantee_sid = LdapUtils.get_sid(self.client, self.domain_dumper, self.args.grantee)
+        grantee_sid = grantee['objectSid']
         if not grantee_sid:
             self.log.error(f'Failed to get SID for: {self.args.grantee}')
             return
@@ -56,14 +56,13 @@ class LdapShellModule(BaseLdapModule):
             self.log.error(f'Target computer not found: {self.args.target}')
             return
 
-        # Get grantee account information
-        grantee_dn = LdapUtils.get_dn(self.client, self.domain_dumper, self.args.grantee)
-        if not grantee_dn:
+        # Get grantee DN and SID in a single search
+        grantee = LdapUtils.get_object(self.client, self.domain_dumper, self.args.grantee, ['objectSid'])
+        if not grantee:
             self.log.error(f'Grantee account not found: {self.args.grantee}')
             return
 
-        # Get grantee SID
-        grantee_sid = LdapUtils.get_sid(self.client, self.domain_dumper, self.args.grantee)
+        grantee_sid = grantee['objectSid']
         if not grantee_sid:
             self.log.error(f'Failed to get SID for: {self.args.grantee}')
             return
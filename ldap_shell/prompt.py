@@ -8,8 +8,10 @@ import logging
 from prompt_toolkit.completion import Completer
 from prompt_toolkit.key_binding import KeyBindings
 from ldap_shell.completers import CompleterFactory
+from ldap_shell.completers.base import ADObjectCacheManager
 from ldap_shell.utils.module_loader import ModuleLoader
 from ldap_shell.utils import history
+from ldap_shell.utils.ldap_utils import LdapUtils
 import shlex
 
 class ModuleCompleter(Completer):
@@ -268,7 +270,11 @@ class Prompt:
 				self.client,
 				logging.getLogger('ldap-shell')
 			)
-		return module()
+		try:
+			return module()
+		finally:
+			# Modules may have modified objects; later lookups must not see stale results
+			LdapUtils.clear_cache()
 
 	def check_args_exist(self, module_name: str, args_dict: dict):
 		module = self.modules[module_name]
@@ -311,13 +317,17 @@ class Prompt:
 				key_bindings=self.kb,
 				complete_while_typing=True
 			)
-		while True:
-			try:
-				line = self.session.prompt(self.prompt)
-				if line.strip() == 'exit':
+		try:
+			while True:
+				try:
+					line = self.session.prompt(self.prompt)
+					if line.strip() == 'exit':
+						break
+					prompt = self.onecmd(line)
+					if prompt:
+						self.prompt = prompt
+				except KeyboardInterrupt:
 					break
-				prompt = self.onecmd(line)
-				if prompt:
-					self.prompt = prompt
-			except KeyboardInterrupt:
-				break  
+		finally:
+			# Don't wait for queued completer cache searches on exit
+			ADObjectCacheManager.shutdown()
@@ -1,134 +1,373 @@
-from typing import Optional
-import re
-from struct import pack, unpack
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+import threading
+import time
 import logging
+from uuid import UUID
+import ldap3
 from ldap_shell.utils.ldaptypes import SR_SECURITY_DESCRIPTOR, LDAP_SID, ACL
+from ldap3.core.exceptions import LDAPBindError, LDAPException, LDAPInvalidDnError, LDAPInvalidDNSyntaxResult, LDAPNoSuchObjectResult
 from ldap3.protocol.microsoft import security_descriptor_control
 
+# Request no attributes ("1.1", RFC 4511) when only the entry's existence or DN is needed
+NO_ATTRS = [ldap3.NO_ATTRIBUTES]
+# Raised for base-scope reads of a missing or malformed DN (depending on raise_exceptions/check_names)
+_NOT_FOUND_ERRORS = (LDAPNoSuchObjectResult, LDAPInvalidDnError, LDAPInvalidDNSyntaxResult)
+
+# RFC 4515 escapes for values embedded in search filters
+_FILTER_ESCAPES = str.maketrans({'\\': '\\5c', '*': '\\2a', '(': '\\28', ')': '\\29', '\x00': '\\00'})
+_FLT_SAM = '(sAMAccountName={})'
+_FLT_SAM_OR_COMPUTER = '(|(sAMAccountName={0})(sAMAccountName={0}$))'
+_FLT_SID = '(objectSid={})'
+# SIDs per OR-filter search, kept well below server filter size limits
+_SID_BATCH_SIZE = 32
+
+# Resolved (domain root, SID) -> sAMAccountName, shared by all lookups
+_sid_cache: Dict[tuple, str] = {}
+
+def _escape_filter_value(value: str) -> str:
+    """Escape a value for use in an LDAP filter (RFC 4515)"""
+    return value.translate(_FILTER_ESCAPES)
+
+class LdapConnectionPool:
+    """Bounded pool of extra LDAP connections sharing the shell client's credentials
+
+    Foreground lookups use the shell client itself, serialized by its lock. Background
+    work (completer cache fills) gets its own connections so it never interleaves with
+    the shell client's results. Connections are only cloned for NTLM/simple binds with
+    credentials; Kerberos SASL binds cannot be replayed, so callers must check
+    can_clone() and do their work in the foreground otherwise. A clone that fails to
+    open is not retried until the client's credentials change. Modules read
+    client.entries without any lock, so background work never uses the shell client.
+    """
+    _pools: Dict[int, 'LdapConnectionPool'] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, client, max_pool_size: int = 4):
+        self.client = client
+        self.max_pool_size = max_pool_size
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._identity = self._client_identity()
+        # Identity whose clone failed to open; no more clones are opened while it is current
+        self._failed_identity = None
+
+    @classmethod
+    def for_client(cls, client) -> 'LdapConnectionPool':
+        """Get the pool bound to a shell client, creating it on first use"""
+        with cls._pools_lock:
+            pool = cls._pools.get(id(client))
+            if pool is None or pool.client is not client:
+                pool = cls._pools[id(client)] = cls(client)
+            return pool
+
+    @contextmanager
+    def acquire(self, background: bool = False):
+        """Yield a connection; results must be read before leaving the block
+
+        Foreground callers get the shell client under its lock; background callers
+        get a pooled clone, and LDAPException is raised if none can be opened.
+        """
+        if not background:
+            with self.client.connection_lock:
+                yield self.client
+            return
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            with self._cond:
+                if self._identity == self._client_identity():
+                    self._idle.append(conn)
+                else:
+                    self._size -= 1
+                    self._unbind(conn)
+                self._cond.notify()
+
+    def paged_search(self, search_base: str, search_filter: str, attributes: list, paged_size: int = 500,
+                     background: bool = True):
+        """Paged subtree search yielding one page of responses at a time
+
+        The connection is re-acquired for every page, so a foreground search only
+        holds the shell client for one round-trip at a time.
+        """
+        cookie = None
+        while True:
+            with self.acquire(background=background) as conn:
+                conn.search(
+                    search_base,
+                    search_filter,
+                    search_scope=ldap3.SUBTREE,
+                    attributes=attributes,
+                    paged_size=paged_size,
+                    paged_cookie=cookie
+                )
+                response = conn.response
+                try:
+                    cookie = conn.result['controls']['1.2.840.113556.1.4.319']['value']['cookie']
+                except KeyError:
+                    cookie = None
+            yield response
+            if not cookie:
+                return
+
+    def _client_identity(self) -> tuple:
+        return (self.client.user, self.client.password, self.client.authentication, self.client.tls_started)
+
+    def can_clone(self) -> bool:
+        """Whether background connections can be opened for this client"""
+        # Only binds ldap3 can replay from stored credentials. The Kerberos client is created
+        # as Connection(server) and bound by hand through SASL, so it reports ANONYMOUS while
+        # carrying a user: an ANONYMOUS clone of it would bind unauthenticated.
+        return (self.client.authentication in (ldap3.NTLM, ldap3.SIMPLE)
+                and bool(self.client.user) and bool(self.client.password)
+                and self._failed_identity != self._client_identity())
+
+    def _checkout(self) -> ldap3.Connection:
+        with self._cond:
+            # Drop clones bound as a previous identity (e.g. after switch_user or start_tls)
+            identity = self._client_identity()
+            if identity != self._identity:
+                self._identity = identity
+                for conn in self._idle:
+                    self._unbind(conn)
+                self._size -= len(self._idle)
+                self._idle = []
+
+            while True:
+                if not self.can_clone():
+                    raise LDAPException('LDAP connection cannot be cloned for background use')
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_pool_size:
+                    self._size += 1
+                    break
+                self._cond.wait()
+
+        try:
+            return self._open()
+        except Exception:
+            # Don't retry until the identity changes: a failed switch_user leaves the rejected
+            # credentials on the client (ldap3 doesn't roll them back), and a bind attempt
+            # per keystroke could lock the account out
+            with self._cond:
+                self._failed_identity = identity
+                self._size -= 1
+                self._cond.notify_all()
+            raise
+
+    def _open(self) -> ldap3.Connection:
+        conn = ldap3.Connection(
+            self.client.server,
+            user=self.client.user,
+            password=self.client.password,
+            authentication=self.client.authentication,
+            client_strategy=ldap3.RESTARTABLE
+        )
+        # The shared Server already holds the schema; re-reading it would download it
+        # again and replace server.info/schema under the shell client from this thread
+        conn.open(read_server_info=False)
+        if self.client.tls_started:
+            conn.start_tls(read_server_info=False)
+        if not conn.bind(read_server_info=False):
+            self._unbind(conn)
+            raise LDAPBindError(f'Failed to open pooled LDAP connection: {conn.result}')
+        return conn
+
+    @staticmethod
+    def _unbind(conn):
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
 class LdapUtils:
+    # LRU cache of get_object results per (client, bound user, name), holding every attribute
+    # fetched so far, so resolving the same account again costs no round-trip.
+    # Cleared by clear_cache() after each shell command, since commands may write.
+    _object_cache: 'OrderedDict[tuple, tuple[float, dict]]' = OrderedDict()
+    _object_cache_lock = threading.Lock()
+    _object_cache_ttl = 60  # Seconds
+    _object_cache_size = 1024
+
     @staticmethod
-    def get_dn(client, domain_dumper, name: str) -> Optional[str]:
-        """Get DN with automatic computer account retry"""
+    def clear_cache():
+        """Forget memoized account and SID lookups"""
+        with LdapUtils._object_cache_lock:
+            LdapUtils._object_cache.clear()
+        _sid_cache.clear()
+
+    @staticmethod
+    def get_object(client, domain_dumper, name: str, attributes: list) -> Optional[dict]:
+        """Get several attributes of an account in one search, with computer account auto-retry
+
+        Returns a dict of the requested attribute values plus the entry DN under 'dn'
+        """
+        key = (id(client), client.user, name.lower())
+        with LdapUtils._object_cache_lock:
+            cached = LdapUtils._object_cache.get(key)
+            if cached and time.monotonic() - cached[0] < LdapUtils._object_cache_ttl:
+                if all(attribute in cached[1] for attribute in attributes):
+                    LdapUtils._object_cache.move_to_end(key)
+                    return {attribute: cached[1][attribute] for attribute in [*attributes, 'dn']}
+            else:
+                cached = None
+
         result = LdapUtils._search_with_retry(
-            client, 
-            domain_dumper, 
+            client,
+            domain_dumper,
             name,
-            attributes=['distinguishedName']
+            attributes=attributes
         )
-        return result.entry_dn if result else None
+        if not result:
+            return None
+
+        obj = {attribute: result[attribute].value for attribute in attributes}
+        obj['dn'] = result.entry_dn
+        with LdapUtils._object_cache_lock:
+            merged = {**cached[1], **obj} if cached and cached[1]['dn'] == obj['dn'] else obj
+            LdapUtils._object_cache[key] = (time.monotonic(), merged)
+            LdapUtils._object_cache.move_to_end(key)
+            if len(LdapUtils._object_cache) > LdapUtils._object_cache_size:
+                LdapUtils._object_cache.popitem(last=False)
+        return dict(obj)
+
+    @staticmethod
+    def get_dn(client, domain_dumper, name: str) -> Optional[str]:
+        """Get DN with automatic computer account retry"""
+        result = LdapUtils.get_object(client, domain_dumper, name, [])
+        return result['dn'] if result else None
 
     @staticmethod
     def get_attribute(client, domain_dumper, name: str, attribute: str) -> Optional[str]:
         """Get attribute with computer account auto-retry"""
-        result = LdapUtils._search_with_retry(
-            client, 
-            domain_dumper, 
-            name,
-            attributes=[attribute]
-        )
-        return result[attribute].value if result else None
+        result = LdapUtils.get_object(client, domain_dumper, name, [attribute])
+        return result[attribute] if result else None
 
     @staticmethod
     def get_sid(client, domain_dumper, name: str) -> Optional[str]:
         """Get SID with computer account auto-retry"""
-        result = LdapUtils._search_with_retry(
-            client, 
-            domain_dumper, 
-            name,
-            attributes=['objectSid']
-        )
-        return result['objectSid'].value if result else None
+        result = LdapUtils.get_object(client, domain_dumper, name, ['objectSid'])
+        return result['objectSid'] if result else None
 
     @staticmethod
     def sid_to_user(client, domain_dumper, sid: str) -> str:
         """Convert SID to samAccountName"""
-        client.search(
-            domain_dumper.root,
-            f'(objectSid={sid})',
-            attributes=['sAMAccountName']
-        )
-        if client.entries:
-            return client.entries[0]['sAMAccountName'].value
-        return None
+        return LdapUtils.sid_to_users(client, domain_dumper, [sid]).get(sid)
+
+    @staticmethod
+    def sid_to_users(client, domain_dumper, sids: list) -> Dict[str, str]:
+        """Convert several SIDs to samAccountNames, one OR-filter search per chunk of SIDs"""
+        users = {}
+        unresolved = []
+        for sid in dict.fromkeys(sids):
+            name = _sid_cache.get((domain_dumper.root, sid))
+            if name is not None:
+                users[sid] = name
+            else:
+                unresolved.append(sid)
+
+        for i in range(0, len(unresolved), _SID_BATCH_SIZE):
+            chunk = unresolved[i:i + _SID_BATCH_SIZE]
+            search_filter = '(|' + ''.join(_FLT_SID.format(_escape_filter_value(sid)) for sid in chunk) + ')'
+            with LdapConnectionPool.for_client(client).acquire() as conn:
+                conn.search(
+                    domain_dumper.root,
+                    search_filter,
+                    attributes=['sAMAccountName', 'objectSid']
+                )
+                entries = conn.entries
+            for entry in entries:
+                sid = entry['objectSid'].value
+                users[sid] = entry['sAMAccountName'].value
+                _sid_cache[(domain_dumper.root, sid)] = users[sid]
+        return users
 
     @staticmethod
     def check_dn(client, domain_dumper, dn: str) -> bool:
         """Check if DN is valid"""
-        client.search(
-            domain_dumper.root,
-            f'(distinguishedName={dn})',
-            attributes=['objectClass']
-        )
-        return len(client.entries) > 0
+        with LdapConnectionPool.for_client(client).acquire() as conn:
+            try:
+                # Read the entry itself instead of filtering the whole tree on distinguishedName
+                conn.search(dn, '(objectClass=*)', search_scope=ldap3.BASE, attributes=NO_ATTRS)
+            except _NOT_FOUND_ERRORS:
+                return False
+            return len(conn.entries) > 0
 
     @staticmethod
     def get_domain_name(dn: str) -> str:
         """Get domain name from DN"""
-        return re.sub(',DC=', '.', dn[dn.find('DC='):], flags=re.I)[3:]
+        # Every component from the first DC= on is a domain component: join their values
+        components = dn[dn.upper().find('DC='):].split(',')
+        return '.'.join(component[3:] for component in components)
 
     @staticmethod
     def get_info_by_dn(client, domain_dumper, dn: str) -> Optional[tuple[bytes, str]]:
         """Get info by DN"""
-        client.search(
-            domain_dumper.root,
-            f'(distinguishedName={dn})',
-            attributes=['nTSecurityDescriptor', 'objectSid'],
-            controls=security_descriptor_control(sdflags=0x04)
-        )
-        if len(client.entries) > 0:
-            return client.entries[0]['nTSecurityDescriptor'].raw_values, client.entries[0]['objectSid'].value
+        with LdapConnectionPool.for_client(client).acquire() as conn:
+            try:
+                conn.search(
+                    dn,
+                    '(objectClass=*)',
+                    search_scope=ldap3.BASE,
+                    attributes=['nTSecurityDescriptor', 'objectSid'],
+                    controls=security_descriptor_control(sdflags=0x04)
+                )
+            except _NOT_FOUND_ERRORS:
+                return None
+            if len(conn.entries) > 0:
+                return conn.entries[0]['nTSecurityDescriptor'].raw_values, conn.entries[0]['objectSid'].value
         return None
 
     @staticmethod
     def get_name_from_dn(dn: str) -> Optional[str]:
         """Get name from DN"""
-        return dn.split(',')[0].split('=')[1]
+        return dn.partition(',')[0].partition('=')[2]
     
     @staticmethod
     def _search_with_retry(client, domain_dumper, name: str, attributes: list):
-        # Initial search
-        client.search(
-            domain_dumper.root,
-            f'(sAMAccountName={name})',
-            attributes=attributes
-        )
-        if client.entries:
-            return client.entries[0]
-        
-        # If not found, try adding $ for computer accounts
-        if not name.endswith('$'):
-            retry_name = f'{name}$'
-            client.search(
+        escaped = _escape_filter_value(name)
+        if name.endswith('$'):
+            search_filter = _FLT_SAM.format(escaped)
+        else:
+            # Look up the computer account in the same round-trip
+            search_filter = _FLT_SAM_OR_COMPUTER.format(escaped)
+
+        with LdapConnectionPool.for_client(client).acquire() as conn:
+            conn.search(
                 domain_dumper.root,
-                f'(sAMAccountName={retry_name})',
-                attributes=attributes
+                search_filter,
+                attributes=list(set(attributes) | {'sAMAccountName'})
             )
-            if client.entries:
-                logging.debug(f'Auto-corrected computer account name: {name} -> {retry_name}')
-                return client.entries[0]
-        
-        return None
+            entries = conn.entries
+
+        if not entries:
+            return None
+
+        # Prefer the exact name if both an account and its computer account exist
+        for entry in entries:
+            if str(entry['sAMAccountName'].value).lower() == name.lower():
+                return entry
+
+        logging.debug(f'Auto-corrected computer account name: {name} -> {name}$')
+        return entries[0]
 
     @staticmethod
     def bin_to_string(uuid):
-        uuid1, uuid2, uuid3 = unpack('<LHH', uuid[:8])
-        uuid4, uuid5, uuid6 = unpack('>HHL', uuid[8:16])
-        return '%08X-%04X-%04X-%04X-%04X%08X' % (uuid1, uuid2, uuid3, uuid4, uuid5, uuid6)
+        # Variant 2 UUID: the first three components are little-endian, the last two big-endian
+        return str(UUID(bytes_le=uuid[:16])).upper()
 
     @staticmethod
     def string_to_bin(uuid):
-        # If a UUID in the 00000000-0000-0000-0000-000000000000 format, parse it as Variant 2 UUID
-        # The first three components of the UUID are little-endian, and the last two are big-endian
-        matches = re.match(
-            r"([\dA-Fa-f]{8})-([\dA-Fa-f]{4})-([\dA-Fa-f]{4})-([\dA-Fa-f]{4})-([\dA-Fa-f]{4})([\dA-Fa-f]{8})",
-            uuid)
-        (uuid1, uuid2, uuid3, uuid4, uuid5, uuid6) = [int(x, 16) for x in matches.groups()]
-        uuid = pack('<LHH', uuid1, uuid2, uuid3)
-        uuid += pack('>HHL', uuid4, uuid5, uuid6)
-        return uuid
+        # Parse a UUID in the 00000000-0000-0000-0000-000000000000 format as Variant 2 UUID
+        return UUID(uuid).bytes_le
     
     @staticmethod
     def create_empty_sd():
+        # Assigning the fields is far cheaper than parsing a pre-serialized template
+        # with SR_SECURITY_DESCRIPTOR(data=...), and callers mutate the result in place
         sd = SR_SECURITY_DESCRIPTOR()
         sd['Revision'] = b'\x01'
         sd['Sbz1'] = b'\x00'